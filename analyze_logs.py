@@ -1,78 +1,183 @@
-import pandas as pd
+import polars as pl
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import numpy as np
 import seaborn as sns
 from collections import defaultdict
-import json
+import orjson
 import sys
 import base64
 import io
+import threading
 from datetime import datetime
 
+plt.rcParams['path.simplify'] = True
+plt.rcParams['path.simplify_threshold'] = 1.0
+
+# Chart figures are created once and redrawn for every analysis; the lock
+# keeps concurrent requests from drawing on the same axes
+_event_dist_fig = Figure(figsize=(10, 6))
+_event_dist_ax = _event_dist_fig.subplots()
+_events_time_fig = Figure(figsize=(12, 6))
+_events_time_ax = _events_time_fig.subplots()
+_render_lock = threading.Lock()
+# tight_layout() starts from the figure's current subplot params, so they are
+# reset to these defaults before each render to keep output reproducible
+_SUBPLOT_DEFAULTS = {k: plt.rcParams[f'figure.subplot.{k}'] for k in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')}
+
+# Largest epoch value in each unit that still fits a nanosecond timestamp;
+# like pandas, the first unit the data fits in is taken as its unit
+_EPOCH_UNIT_LIMITS = [('s', 9_223_372_036), ('ms', 9_223_372_036_854), ('us', 9_223_372_036_854_775), ('ns', 2**63 - 1)]
+
+def _value_counts(column, limit=None):
+    """Non-null value counts of a column, most frequent first, as one list value"""
+    counts = pl.col(column).drop_nulls().value_counts(sort=True)
+    return (counts.head(limit) if limit else counts).implode()
+
+def _counts_dict(counts, column):
+    """Turn a collected _value_counts list into a {value: count} dict"""
+    return {item[column]: item['count'] for item in counts}
+
+def _parse_timestamps(lf, column):
+    """Convert a timestamp column to datetimes. Strings are parsed leniently
+    and integers are read as epoch time in the unit their magnitude implies."""
+    dtype = lf.collect_schema()[column]
+    if dtype.is_temporal():
+        return lf
+    if dtype == pl.String:
+        return lf.with_columns(pl.col(column).str.to_datetime(strict=False))
+    if dtype.is_integer():
+        largest = lf.select(pl.col(column).abs().max()).collect().item() or 0
+        unit = next(unit for unit, limit in _EPOCH_UNIT_LIMITS if largest <= limit)
+        return lf.with_columns(pl.from_epoch(column, time_unit=unit))
+    raise ValueError(f"Column '{column}' has type {dtype}; expected datetimes, strings or integer epoch times")
+
+def _hourly_counts(lf, time_column, type_column):
+    """Lazy event counts per type and hour, bucketed on integer epoch hours"""
+    hour = pl.col(time_column).dt.epoch('s') // 3600
+    return (
+        lf.drop_nulls([type_column, time_column])
+        .group_by(type_column, hour.alias('hour'))
+        .agg(pl.len())
+        .sort(type_column, 'hour')
+        .select(type_column, pl.from_epoch(pl.col('hour') * 3600, time_unit='s').alias(time_column), 'len')
+    )
+
+def _render_image(fig):
+    """Encode a figure as base64 lossy WebP, which is much smaller than PNG"""
+    img = io.BytesIO()
+    fig.savefig(img, format='webp', bbox_inches='tight', pil_kwargs={'quality': 80, 'method': 4})
+    return base64.b64encode(img.getvalue()).decode()
+
+def _downsample_for_pixels(x, y, n_pixels):
+    """Keep the first, last, minimum and maximum point of each pixel column
+    of the x range, which draws the same line as the full series at that
+    width (M4). x must be sorted."""
+    x, y = np.asarray(x), np.asarray(y)
+    if len(y) <= 2 * n_pixels:
+        return x, y
+    positions = x.view(np.int64) if np.issubdtype(x.dtype, np.datetime64) else x
+    edges = np.searchsorted(positions, np.linspace(positions[0], positions[-1], n_pixels + 1))
+    edges[-1] = len(y)
+    keep = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        # Pixel columns without samples have nothing to draw
+        if start == end:
+            continue
+        keep += [start, end - 1, start + y[start:end].argmin(), start + y[start:end].argmax()]
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+def plot_event_distribution(event_distribution):
+    """Render the event distribution pie chart from a {type: count} dict"""
+    with _render_lock:
+        ax = _event_dist_ax
+        try:
+            ax.pie(list(event_distribution.values()), labels=list(event_distribution), autopct='%1.1f%%')
+            ax.set_title('Event Distribution')
+            return _render_image(_event_dist_fig)
+        finally:
+            ax.clear()
+
+def plot_events_over_time(hourly, time_column, type_column):
+    """Render hourly event counts per type as a line chart"""
+    with _render_lock:
+        ax = _events_time_ax
+        try:
+            n_pixels = int(_events_time_fig.get_figwidth() * _events_time_fig.dpi)
+            for (log_type,), group in hourly.group_by(type_column, maintain_order=True):
+                x, y = _downsample_for_pixels(group[time_column].to_numpy(), group['len'].to_numpy(), n_pixels)
+                ax.plot(x, y, label=log_type)
+            ax.set_title('Events Over Time')
+            ax.set_xlabel('Time')
+            ax.set_ylabel('Number of Events')
+            ax.tick_params(axis='x', labelrotation=45)
+            ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+            _events_time_fig.subplots_adjust(**_SUBPLOT_DEFAULTS)
+            _events_time_fig.tight_layout()
+            return _render_image(_events_time_fig)
+        finally:
+            ax.clear()
+
 def analyze_logs(file_path):
     """Analyze log file and return results as JSON"""
     # Read the file
     file_extension = file_path.split('.')[-1].lower()
     
     if file_extension == 'csv':
-        df = pd.read_csv(file_path, parse_dates=['timestamp'])
+        lf = pl.scan_csv(file_path, try_parse_dates=True)
     elif file_extension == 'json':
-        df = pd.read_json(file_path)
+        lf = pl.read_json(file_path).lazy()
     else:
         raise ValueError('Unsupported file format')
 
+    lf = _parse_timestamps(lf, 'timestamp')
+    columns = lf.collect_schema().names()
+
+    # Build every aggregate as one lazy plan so the file is scanned once;
+    # all value counts are computed in the same select
+    top_columns = [c for c in ('action', 'src_ip', 'user', 'app') if c in columns]
+    summary = lf.select(
+        total_events=pl.len(),
+        valid_events=(pl.col('log_type').is_not_null() & pl.col('timestamp').is_not_null()).sum(),
+        start=pl.col('timestamp').min(),
+        end=pl.col('timestamp').max(),
+        event_distribution=_value_counts('log_type'),
+        **{c: _value_counts(c, limit=10) for c in top_columns}
+    )
+    hourly = _hourly_counts(lf, 'timestamp', 'log_type')
+    summary, hourly = pl.collect_all([summary, hourly], engine='streaming')
+    summary = summary.row(0, named=True)
+    top = {c: _counts_dict(summary[c], c) for c in top_columns}
+
     # Get total events and valid events
-    total_events = len(df)
-    valid_events = df.dropna(subset=['log_type', 'timestamp']).shape[0]
+    total_events = summary['total_events']
+    valid_events = summary['valid_events']
     
     # Get time range
     time_range = {
-        'start': df['timestamp'].min().isoformat() if not df['timestamp'].empty else None,
-        'end': df['timestamp'].max().isoformat() if not df['timestamp'].empty else None
+        'start': summary['start'].isoformat() if summary['start'] is not None else None,
+        'end': summary['end'].isoformat() if summary['end'] is not None else None
     }
     
     # Get event distribution
-    event_distribution = df['log_type'].value_counts().to_dict()
+    event_distribution = _counts_dict(summary['event_distribution'], 'log_type')
     
-    # Get top actions
-    actions = df['action'].value_counts().head(10).to_dict() if 'action' in df.columns else {}
-    
-    # Get top source IPs
-    source_ips = df['src_ip'].value_counts().head(10).to_dict() if 'src_ip' in df.columns else {}
-    
-    # Get top users
-    users = df['user'].value_counts().head(10).to_dict() if 'user' in df.columns else {}
+    # Get top actions, source IPs and users
+    actions = top.get('action', {})
+    source_ips = top.get('src_ip', {})
+    users = top.get('user', {})
     
     # Create event distribution chart
-    plt.figure(figsize=(10, 6))
-    df['log_type'].value_counts().plot(kind='pie', autopct='%1.1f%%')
-    plt.title('Event Distribution')
-    
-    event_dist_img = io.BytesIO()
-    plt.savefig(event_dist_img, format='png', bbox_inches='tight')
-    event_dist_img.seek(0)
-    event_dist_b64 = base64.b64encode(event_dist_img.getvalue()).decode()
-    plt.close()
+    event_dist_b64 = plot_event_distribution(event_distribution)
     
     # Create events over time chart
-    plt.figure(figsize=(12, 6))
-    df.groupby(['log_type', pd.Grouper(key='timestamp', freq='h')]).size().unstack().plot(kind='line')
-    plt.title('Events Over Time')
-    plt.xlabel('Time')
-    plt.ylabel('Number of Events')
-    plt.xticks(rotation=45)
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    
-    events_time_img = io.BytesIO()
-    plt.savefig(events_time_img, format='png', bbox_inches='tight')
-    events_time_img.seek(0)
-    events_time_b64 = base64.b64encode(events_time_img.getvalue()).decode()
-    plt.close()
+    events_time_b64 = plot_events_over_time(hourly, 'timestamp', 'log_type')
 
     # Add additional analysis
-    app_distribution = df['app'].value_counts().head(10).to_dict() if 'app' in df.columns else {}
+    app_distribution = top.get('app', {})
     
     return {
         'total_events': total_events,
@@ -91,12 +196,12 @@ def analyze_logs(file_path):
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
-        print(json.dumps({'error': 'Please provide a file path'}))
+        print(orjson.dumps({'error': 'Please provide a file path'}).decode())
         sys.exit(1)
     
     try:
         results = analyze_logs(sys.argv[1])
-        print(json.dumps(results))
+        print(orjson.dumps(results, option=orjson.OPT_NON_STR_KEYS).decode())
     except Exception as e:
-        print(json.dumps({'error': str(e)}))
+        print(orjson.dumps({'error': str(e)}).decode())
         sys.exit(1) 
\ No newline at end of file
@@ -1,81 +1,193 @@
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
 from flask import Flask, render_template, request, jsonify
 import os
+import hashlib
+import multiprocessing
+import threading
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from werkzeug.utils import secure_filename
-import pandas as pd
-import json
-import io
-import base64
-from datetime import datetime
-from analyze_logs import analyze_temporal_patterns, analyze_traffic_patterns, analyze_security_patterns, analyze_system_patterns
+import polars as pl
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from analyze_logs import _value_counts, _counts_dict, _hourly_counts, plot_event_distribution, plot_events_over_time
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-ALLOWED_EXTENSIONS = {'csv', 'json'}
+# CSV parsing and chart rendering are CPU-bound, so analyses run in worker
+# processes instead of the request threads. Workers start on first use and
+# are spawned rather than forked, since forking a threaded process that has
+# Polars loaded can deadlock.
+def new_analysis_pool():
+    return ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context('spawn'))
+
+analysis_pool = new_analysis_pool()
+analysis_pool_lock = threading.Lock()
+
+def replace_broken_pool(broken_pool):
+    """Swap in a fresh pool after a worker crash broke the given one"""
+    global analysis_pool
+    with analysis_pool_lock:
+        if analysis_pool is broken_pool:
+            analysis_pool = new_analysis_pool()
+    broken_pool.shutdown(wait=False)
+
+ALLOWED_EXTENSIONS = {'csv', 'json', 'parquet'}
+
+# Uploads are copied to disk in 1 MiB writes
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Analysis results are cached by upload content hash; only the most
+# recently used entries are kept
+ANALYSIS_CACHE_SIZE = 64
+# Bump whenever analyze_logs output changes so stale cache entries are ignored
+ANALYSIS_CACHE_VERSION = 1
+
+# Columns read by analyze_logs; everything else is dropped at ingest
+ANALYSIS_COLUMNS = ['type', 'time_generated', 'action', 'src', 'user']
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def analyze_logs(file_path):
+def save_upload(file, filepath):
+    """Stream an uploaded file to disk and hint the kernel it is read back next.
+    Returns the SHA-256 hex digest of the content."""
+    digest = hashlib.sha256()
+    fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # posix_fadvise is not available on macOS
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(fd, view):]
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+    return digest.hexdigest()
+
+def analysis_cache_dir():
+    return os.path.join(app.config['UPLOAD_FOLDER'], '_cache')
+
+def analysis_cache_path(digest, extension):
+    # The extension picks the reader, so identical bytes uploaded as .csv and
+    # .json are analyzed differently and must not share an entry
+    return os.path.join(analysis_cache_dir(), f'{digest}.{extension}.v{ANALYSIS_CACHE_VERSION}.json')
+
+def load_cached_analysis(digest, extension):
+    """Return cached results for an upload, or None on a miss"""
+    path = analysis_cache_path(digest, extension)
+    try:
+        with open(path, 'rb') as f:
+            results = orjson.loads(f.read())
+        # Mark the entry as recently used
+        os.utime(path)
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        # Missing, evicted by another request, or unreadable: analyze again
+        return None
+    return results
+
+def store_cached_analysis(digest, extension, results):
+    """Cache results for an upload and evict least recently used entries"""
+    cache_dir = analysis_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = analysis_cache_path(digest, extension)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        # Value counts of numeric columns have non-string keys
+        f.write(orjson.dumps(results, option=orjson.OPT_NON_STR_KEYS))
+    os.replace(tmp_path, path)
+    
+    entries = [e for e in os.scandir(cache_dir) if e.name.endswith('.json')]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:-ANALYSIS_CACHE_SIZE]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+def read_csv_columns(csv_path):
+    """Parse only the analysed columns of a CSV file into an Arrow table"""
+    return pa_csv.read_csv(
+        csv_path,
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=ANALYSIS_COLUMNS,
+            include_missing_columns=True,
+            strings_can_be_null=True,
+            # Parsed leniently by analyze_logs, so one odd value or a
+            # non-ISO layout does not fail the whole upload
+            column_types={'time_generated': pa.string()}
+        )
+    )
+
+def scan_logs(file_path):
+    """Return a lazy frame over the analysed columns of a log file"""
     file_extension = file_path.rsplit('.', 1)[1].lower()
     
     if file_extension == 'csv':
-        df = pd.read_csv(file_path, parse_dates=['receive_time', 'time_generated'])
+        lf = pl.from_arrow(read_csv_columns(file_path)).lazy()
+    elif file_extension == 'parquet':
+        lf = pl.scan_parquet(file_path)
     elif file_extension == 'json':
-        df = pd.read_json(file_path)
+        lf = pl.read_json(file_path).lazy()
+    
+    return lf.select([c for c in ANALYSIS_COLUMNS if c in lf.collect_schema()])
+
+def analyze_logs(file_path):
+    lf = scan_logs(file_path)
+    
+    if lf.collect_schema()['time_generated'] == pl.String:
+        lf = lf.with_columns(pl.col('time_generated').str.to_datetime(strict=False))
+    columns = lf.collect_schema().names()
+    
+    # Build every aggregate as one lazy plan so the file is scanned once;
+    # all value counts are computed in the same select
+    top_columns = [c for c in ('action', 'src', 'user') if c in columns]
+    summary = lf.select(
+        total_events=pl.len(),
+        valid_events=(pl.col('type').is_not_null() & pl.col('time_generated').is_not_null()).sum(),
+        start=pl.col('time_generated').min(),
+        end=pl.col('time_generated').max(),
+        event_distribution=_value_counts('type'),
+        **{c: _value_counts(c, limit=10) for c in top_columns}
+    )
+    hourly = _hourly_counts(lf, 'time_generated', 'type')
+    summary, hourly = pl.collect_all([summary, hourly], engine='streaming')
+    summary = summary.row(0, named=True)
+    top = {c: _counts_dict(summary[c], c) for c in top_columns}
     
     # Get total events
-    total_events = len(df)
-    valid_events = df.dropna(subset=['type', 'time_generated']).shape[0]
+    total_events = summary['total_events']
+    valid_events = summary['valid_events']
     
     # Get time range
     time_range = {
-        'start': df['time_generated'].min().isoformat() if not df['time_generated'].empty else None,
-        'end': df['time_generated'].max().isoformat() if not df['time_generated'].empty else None
+        'start': summary['start'].isoformat() if summary['start'] is not None else None,
+        'end': summary['end'].isoformat() if summary['end'] is not None else None
     }
     
     # Get event distribution
-    event_distribution = df['type'].value_counts().to_dict()
-    
-    # Get top actions
-    actions = df['action'].value_counts().head(10).to_dict() if 'action' in df.columns else {}
+    event_distribution = _counts_dict(summary['event_distribution'], 'type')
     
-    # Get top source IPs
-    source_ips = df['src'].value_counts().head(10).to_dict() if 'src' in df.columns else {}
-    
-    # Get top users (if available)
-    users = df['user'].value_counts().head(10).to_dict() if 'user' in df.columns else {}
+    # Get top actions, source IPs and users (if available)
+    actions = top.get('action', {})
+    source_ips = top.get('src', {})
+    users = top.get('user', {})
     
     # Create event distribution chart
-    plt.figure(figsize=(10, 6))
-    df['type'].value_counts().plot(kind='pie', autopct='%1.1f%%')
-    plt.title('Event Distribution')
-    
-    event_dist_img = io.BytesIO()
-    plt.savefig(event_dist_img, format='png', bbox_inches='tight')
-    event_dist_img.seek(0)
-    event_dist_b64 = base64.b64encode(event_dist_img.getvalue()).decode()
-    plt.close()
+    event_dist_b64 = plot_event_distribution(event_distribution)
     
     # Create events over time chart
-    plt.figure(figsize=(12, 6))
-    df.groupby(['type', pd.Grouper(key='time_generated', freq='1H')]).size().unstack().plot(kind='line')
-    plt.title('Events Over Time')
-    plt.xlabel('Time')
-    plt.ylabel('Number of Events')
-    plt.xticks(rotation=45)
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    
-    events_time_img = io.BytesIO()
-    plt.savefig(events_time_img, format='png', bbox_inches='tight')
-    events_time_img.seek(0)
-    events_time_b64 = base64.b64encode(events_time_img.getvalue()).decode()
-    plt.close()
+    events_time_b64 = plot_events_over_time(hourly, 'time_generated', 'type')
     
     return {
         'total_events': total_events,
@@ -113,10 +225,19 @@ def upload_file():
         
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        extension = filename.rsplit('.', 1)[1].lower()
+        digest = save_upload(file, filepath)
         
-        # Analyze the log file
-        results = analyze_logs(filepath)
+        # Analyze the log file unless the same content was analyzed before
+        results = load_cached_analysis(digest, extension)
+        if results is None:
+            pool = analysis_pool
+            try:
+                results = pool.submit(analyze_logs, filepath).result()
+            except BrokenProcessPool:
+                replace_broken_pool(pool)
+                raise
+            store_cached_analysis(digest, extension, results)
         
         # Clean up the uploaded file
         os.remove(filepath)
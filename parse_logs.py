@@ -1,12 +1,16 @@
 import re
-import csv
-from typing import Dict, List, Optional, Tuple
-import json
-from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import orjson
 import pytz
 from collections import defaultdict
 import ipaddress
 import os
+import sys
+import ahocorasick
+import polars as pl
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 
 # CIM Categories and their field mappings
 CIM_CATEGORIES = {
@@ -97,18 +101,81 @@ CIM_CATEGORIES = {
     }
 }
 
+# parse_file hands the CSV reader 8 MiB blocks, each parsed into one batch
+CSV_BLOCK_SIZE = 8 << 20
+
+# Output files are written through a 1 MiB buffer
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Direct mapping for known log types
+LOG_TYPE_CATEGORIES = {
+    'TRAFFIC': 'Network_Traffic',
+    'USER': 'Authentication',
+    'SYSTEM': 'System',
+    'THREAT': 'Threat_Detection'
+}
+
+# Category names and lowercased indicators are interned once at import so
+# every parsed event shares the same string objects
+CATEGORY_NAMES = tuple(sys.intern(name) for name in [*CIM_CATEGORIES, 'Unknown'])
+CATEGORY_INDICATORS = {
+    sys.intern(name): tuple(sys.intern(indicator.lower()) for indicator in info['indicators'])
+    for name, info in CIM_CATEGORIES.items()
+}
+CATEGORY_DTYPE = pl.Enum(CATEGORY_NAMES)
+
+def cim_category_expr(columns: Sequence[str]) -> pl.Expr:
+    """Column expression equivalent to LogParser.identify_cim_category"""
+    def text(name: str) -> pl.Expr:
+        return pl.col(name).fill_null('') if name in columns else pl.lit('')
+
+    log_type = text('log_type').str.to_uppercase()
+    searchable = pl.concat_str([log_type, text('details'), text('action')], separator='\n').str.to_lowercase()
+
+    category = pl.when(log_type.is_in(list(LOG_TYPE_CATEGORIES))).then(
+        log_type.replace_strict(LOG_TYPE_CATEGORIES, default=None))
+    for name, indicators in CATEGORY_INDICATORS.items():
+        category = category.when(searchable.str.contains_any(list(indicators))).then(pl.lit(name))
+    return category.otherwise(pl.lit('Unknown')).cast(CATEGORY_DTYPE)
+
+# Dotted-quad IPv4 without leading zeros, i.e. addresses ipaddress always accepts
+IPV4_PATTERN = r'^(?:(?:25[0-5]|2[0-4][0-9]|1[0-9]{2}|[1-9]?[0-9])\.){3}(?:25[0-5]|2[0-4][0-9]|1[0-9]{2}|[1-9]?[0-9])$'
+IPV4_REGEX = re.compile(IPV4_PATTERN)
+
+REQUIRED_FIELDS = ['timestamp', 'log_type', 'action']
+VALID_ACTIONS = frozenset(['allow', 'deny', 'drop', 'alert', 'block'])
+
+def clean_event_expr(columns: Sequence[str]) -> pl.Expr:
+    """Column expression that is true for rows validate_fields passes without errors or warnings"""
+    checks = [pl.col(field).fill_null('') != '' if field in columns else pl.lit(False)
+              for field in REQUIRED_FIELDS]
+    checks += [pl.col(field).fill_null('').str.contains(IPV4_PATTERN)
+               for field in ('src_ip', 'dst_ip') if field in columns]
+    if 'action' in columns:
+        checks.append(pl.col('action').str.to_lowercase().is_in(list(VALID_ACTIONS)))
+    return pl.all_horizontal(checks)
+
+def write_ndjson(path: str, records: Iterable[Dict]):
+    """Write records as newline-delimited JSON, one record at a time"""
+    with open(path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as f:
+        for record in records:
+            f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+
+@dataclass(slots=True, frozen=True)
 class ValidationResult:
-    def __init__(self, is_valid: bool, errors: List[str] = None, warnings: List[str] = None):
-        self.is_valid = is_valid
-        self.errors = errors or []
-        self.warnings = warnings or []
+    is_valid: bool
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
 
+@dataclass(slots=True, frozen=True)
 class ParsedEvent:
-    def __init__(self, event_data: Dict, validation_result: ValidationResult, cim_category: str):
-        self.data = event_data
-        self.validation = validation_result
-        self.cim_category = cim_category
-        self.original_line = event_data.get('original_line', '')
+    data: Dict
+    validation: ValidationResult
+    cim_category: str
+
+    @property
+    def original_line(self) -> str:
+        return self.data.get('original_line', '')
 
 class LogParser:
     def __init__(self):
@@ -129,16 +196,29 @@ class LogParser:
             },
             'timestamp_ranges': {
                 'earliest': None,
-                'latest': None
+                'latest': None,
+                'unparsed': 0
             }
         }
         
         # Initialize event storage
         self.valid_events = []
         self.invalid_events = []
+        
+        # Match every category indicator in one scan; each indicator maps to
+        # the position of the first category that lists it
+        self.indicator_automaton = ahocorasick.Automaton()
+        for index, indicators in enumerate(CATEGORY_INDICATORS.values()):
+            for indicator in indicators:
+                if indicator not in self.indicator_automaton:
+                    self.indicator_automaton.add_word(indicator, index)
+        self.indicator_automaton.make_automaton()
 
     def validate_ip(self, ip: str) -> Tuple[bool, Optional[str]]:
         """Validate IP address format"""
+        # Plain dotted-quad addresses skip building an ipaddress object
+        if IPV4_REGEX.fullmatch(ip):
+            return True, None
         try:
             ipaddress.ip_address(ip)
             return True, None
@@ -151,8 +231,7 @@ class LogParser:
         warnings = []
         
         # Basic field presence validation
-        required_fields = ['timestamp', 'log_type', 'action']
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in event or not event[field]:
                 errors.append(f"Missing required field: {field}")
 
@@ -168,8 +247,7 @@ class LogParser:
                 errors.append(f"Invalid destination IP: {error}")
 
         # Action validation
-        valid_actions = ['allow', 'deny', 'drop', 'alert', 'block']
-        if 'action' in event and event['action'].lower() not in valid_actions:
+        if 'action' in event and event['action'].lower() not in VALID_ACTIONS:
             warnings.append(f"Unusual action value: {event['action']}")
 
         return ValidationResult(len(errors) == 0, errors, warnings)
@@ -177,82 +255,115 @@ class LogParser:
     def identify_cim_category(self, event: Dict) -> str:
         """Identify the CIM category for an event"""
         log_type = event.get('log_type', '').upper()
-        details = event.get('details', '').lower()
-        action = event.get('action', '').lower()
         
         # Direct mapping for known log types
-        type_mapping = {
-            'TRAFFIC': 'Network_Traffic',
-            'USER': 'Authentication',
-            'SYSTEM': 'System',
-            'THREAT': 'Threat_Detection'
-        }
-        
-        if log_type in type_mapping:
-            return type_mapping[log_type]
+        if log_type in LOG_TYPE_CATEGORIES:
+            return LOG_TYPE_CATEGORIES[log_type]
             
-        # Analyze event details for category indicators
-        for category, info in CIM_CATEGORIES.items():
-            for indicator in info['indicators']:
-                if (indicator.lower() in log_type.lower() or
-                    indicator.lower() in details.lower() or
-                    indicator.lower() in action.lower()):
-                    return category
-        
-        return 'Unknown'
+        # Analyze event details for category indicators; categories listed
+        # first win when indicators of several categories match
+        joined = f"{log_type}\n{event.get('details', '')}\n{event.get('action', '')}".lower()
+        matches = [index for _, index in self.indicator_automaton.iter(joined)]
+        return CATEGORY_NAMES[min(matches)] if matches else 'Unknown'
 
-    def process_event(self, event: Dict) -> ParsedEvent:
+    def process_event(self, event: Dict, cim_category: Optional[str] = None,
+                      validation_result: Optional[ValidationResult] = None) -> ParsedEvent:
         """Process and validate a single event"""
-        # Identify CIM category
-        cim_category = self.identify_cim_category(event)
-        self.stats['by_cim_category'][cim_category] += 1
+        # Identify CIM category unless it was already assigned for the whole file
+        if cim_category is None:
+            cim_category = self.identify_cim_category(event)
         
-        # Validate fields
-        validation_result = self.validate_fields(event, cim_category)
+        # Validate fields unless the event already passed vectorized validation
+        if validation_result is None:
+            validation_result = self.validate_fields(event, cim_category)
         
         # Update statistics
+        parsed_event = ParsedEvent(event, validation_result, cim_category)
         if validation_result.is_valid:
             self.stats['validation']['valid_events'] += 1
-            self.valid_events.append(ParsedEvent(event, validation_result, cim_category))
+            self.valid_events.append(parsed_event)
         else:
             self.stats['validation']['invalid_events'] += 1
-            self.invalid_events.append(ParsedEvent(event, validation_result, cim_category))
-            
-        # Track field usage
-        for field in event:
-            if event[field]:
-                self.stats['field_usage'][cim_category][field] += 1
+            self.invalid_events.append(parsed_event)
+        
+        return parsed_event
+
+    def process_batch(self, df: pl.DataFrame):
+        """Process and validate a batch of events read as text columns"""
+        self.stats['total_lines'] += df.height
+        self.stats['parsed_lines'] += df.height
+        
+        # Assign CIM categories and count event types for the whole batch at once
+        categories = df.select(cim_category_expr(df.columns).alias('cim_category')).to_series()
+        for log_type, count in df.group_by('log_type', maintain_order=True).len().iter_rows():
+            self.stats['by_type'][log_type] += count
+        for cim_category, count in categories.to_frame().group_by('cim_category', maintain_order=True).len().iter_rows():
+            self.stats['by_cim_category'][cim_category] += count
+        
+        # Track field usage, keeping fields in the order they are first seen
+        positions = {field: position for position, field in enumerate(df.columns)}
+        field_usage = (
+            df.with_row_index('row').with_columns(cim_category=categories)
+            .unpivot(index=['row', 'cim_category'], variable_name='field')
+            .filter(pl.col('value') != '')
+            .group_by('cim_category', 'field')
+            .agg(pl.len(), pl.col('row').min())
+            .sort('row', pl.col('field').replace_strict(positions, return_dtype=pl.Int64))
+        )
+        for cim_category, field, count, _ in field_usage.iter_rows():
+            self.stats['field_usage'][cim_category][field] += count
+        
+        # Track timestamp ranges; unparsable timestamps become nulls
+        if 'timestamp' in df.columns:
+            timestamps = df.select(
+                pl.col('timestamp').str.to_datetime(format='%Y-%m-%dT%H:%M:%S%.f', strict=False)
+            ).to_series()
+            earliest, latest = timestamps.min(), timestamps.max()
+            ranges = self.stats['timestamp_ranges']
+            if earliest is not None and (not ranges['earliest'] or earliest < ranges['earliest']):
+                ranges['earliest'] = earliest
+            if latest is not None and (not ranges['latest'] or latest > ranges['latest']):
+                ranges['latest'] = latest
+            ranges['unparsed'] += timestamps.null_count() - (df['timestamp'] == '').sum()
         
-        return ParsedEvent(event, validation_result, cim_category)
+        # Only rows failing vectorized validation are re-validated field by
+        # field for detailed error messages
+        clean = df.select(clean_event_expr(df.columns)).to_series()
+        # Clean rows share one immutable result
+        clean_result = ValidationResult(True)
+        codes = categories.to_physical()
+        for row, code, is_clean in zip(df.iter_rows(named=True), codes, clean):
+            self.process_event(row, CATEGORY_NAMES[code], clean_result if is_clean else None)
 
     def parse_file(self, input_file: str, output_dir: str = 'parsed_output'):
         """Parse the PA logs file"""
         os.makedirs(output_dir, exist_ok=True)
+        self.stats['total_lines'] = 0
         
-        with open(input_file, 'r') as f:
-            reader = csv.DictReader(f)
-            self.stats['total_lines'] = 0
-            
-            for row in reader:
-                self.stats['total_lines'] += 1
-                self.stats['parsed_lines'] += 1
-                
-                # Track event type statistics
-                log_type = row['log_type']
-                self.stats['by_type'][log_type] += 1
-                
-                # Process the event
-                self.process_event(row)
-                
-                # Track timestamp ranges
-                try:
-                    timestamp = datetime.strptime(row['timestamp'], '%Y-%m-%dT%H:%M:%S.%f')
-                    if not self.stats['timestamp_ranges']['earliest'] or timestamp < self.stats['timestamp_ranges']['earliest']:
-                        self.stats['timestamp_ranges']['earliest'] = timestamp
-                    if not self.stats['timestamp_ranges']['latest'] or timestamp > self.stats['timestamp_ranges']['latest']:
-                        self.stats['timestamp_ranges']['latest'] = timestamp
-                except ValueError:
-                    pass
+        # An empty file has no header; csv.DictReader yielded no rows for it
+        if os.path.getsize(input_file) == 0:
+            self.save_results(output_dir)
+            return self.valid_events, self.invalid_events
+        
+        read_options = pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE)
+        # Quoted values may span lines, as csv.DictReader allowed
+        parse_options = pa_csv.ParseOptions(newlines_in_values=True)
+        # Let Arrow read the header so the same parser names the columns
+        with pa_csv.open_csv(input_file, read_options=read_options, parse_options=parse_options) as header_reader:
+            columns = header_reader.schema.names
+        # csv.DictReader kept the last of repeated column names
+        keep = list({name: i for i, name in enumerate(columns)}.values())
+        
+        # Stream the file in large blocks, reading every column as text the
+        # way csv.DictReader would
+        reader = pa_csv.open_csv(
+            input_file,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=pa_csv.ConvertOptions(column_types={c: pa.string() for c in columns})
+        )
+        for batch in reader:
+            self.process_batch(pl.from_arrow(batch.select(keep)).fill_null(''))
 
         # Save results
         self.save_results(output_dir)
@@ -261,24 +372,22 @@ class LogParser:
     def save_results(self, output_dir: str):
         """Save parsing results to files"""
         # Save valid events
-        with open(os.path.join(output_dir, 'valid_events.json'), 'w') as f:
-            json.dump([{
-                'data': event.data,
-                'cim_category': event.cim_category
-            } for event in self.valid_events], f, indent=2)
+        write_ndjson(os.path.join(output_dir, 'valid_events.ndjson'), ({
+            'data': event.data,
+            'cim_category': event.cim_category
+        } for event in self.valid_events))
 
         # Save invalid events
-        with open(os.path.join(output_dir, 'invalid_events.json'), 'w') as f:
-            json.dump([{
-                'data': event.data,
-                'cim_category': event.cim_category,
-                'errors': event.validation.errors,
-                'warnings': event.validation.warnings
-            } for event in self.invalid_events], f, indent=2)
+        write_ndjson(os.path.join(output_dir, 'invalid_events.ndjson'), ({
+            'data': event.data,
+            'cim_category': event.cim_category,
+            'errors': event.validation.errors,
+            'warnings': event.validation.warnings
+        } for event in self.invalid_events))
 
         # Save statistics
-        with open(os.path.join(output_dir, 'statistics.json'), 'w') as f:
-            json.dump({
+        with open(os.path.join(output_dir, 'statistics.json'), 'wb', buffering=OUTPUT_BUFFER_SIZE) as f:
+            f.write(orjson.dumps({
                 'total_lines': self.stats['total_lines'],
                 'parsed_lines': self.stats['parsed_lines'],
                 'failed_lines': self.stats['failed_lines'],
@@ -286,7 +395,7 @@ class LogParser:
                 'by_cim_category': dict(self.stats['by_cim_category']),
                 'field_usage': dict(self.stats['field_usage']),
                 'validation': self.stats['validation']
-            }, f, indent=2)
+            }, option=orjson.OPT_INDENT_2))
 
     def print_stats(self):
         """Print enhanced statistics with validation details and CIM compliance coverage"""
@@ -326,19 +435,20 @@ class LogParser:
             print(f"Latest: {self.stats['timestamp_ranges']['latest']}")
             duration = self.stats['timestamp_ranges']['latest'] - self.stats['timestamp_ranges']['earliest']
             print(f"Duration: {duration}")
+        if self.stats['timestamp_ranges']['unparsed']:
+            print(f"Unparsed timestamps: {self.stats['timestamp_ranges']['unparsed']}")
 
 def main():
     parser = LogParser()
     print("Starting log parsing...")
-    # Parse PA_logs_1000.csv and save results to parsed_logs.json
+    # Parse PA_logs_1000.csv and save results to parsed_logs.ndjson
     valid_events, invalid_events = parser.parse_file('PA_logs_1000.csv')
     
-    # Save to parsed_logs.json
-    with open('parsed_logs.json', 'w') as f:
-        json.dump([{
-            'data': event.data,
-            'cim_category': event.cim_category
-        } for event in valid_events], f, indent=2)
+    # Save to parsed_logs.ndjson
+    write_ndjson('parsed_logs.ndjson', ({
+        'data': event.data,
+        'cim_category': event.cim_category
+    } for event in valid_events))
     
     parser.print_stats()
 
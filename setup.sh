@@ -18,7 +18,7 @@ fi
 
 # Check if required Python packages are installed
 echo "Installing Python dependencies..."
-pip install pandas matplotlib seaborn
+pip install polars pyarrow pyahocorasick orjson matplotlib seaborn
 
 # Create required directories
 echo "Creating required directories..."
@@ -1,24 +1,30 @@
-import json
 import matplotlib.pyplot as plt
+import numpy as np
+import polars as pl
 import seaborn as sns
-from datetime import datetime
-import pandas as pd
-from collections import defaultdict
 
-def load_data(filename='parsed_logs.json'):
-    with open(filename, 'r') as f:
-        return json.load(f)
+def load_data(filename='parsed_logs.ndjson'):
+    # One row per event with the event fields flattened next to cim_category
+    return pl.read_ndjson(filename).unnest('data').with_columns(
+        pl.col('timestamp').str.to_datetime(format='%Y-%m-%dT%H:%M:%S%.f', strict=False)
+    )
+
+def count_by_category(data, column):
+    """Count events per value of column (rows) and CIM category (columns)"""
+    return (
+        data.group_by(column, 'cim_category', maintain_order=True).len()
+        .pivot(on='cim_category', index=column, values='len')
+        .fill_null(0)
+    )
 
 def create_event_distribution_plot(data):
     # Count events by category
-    category_counts = defaultdict(int)
-    for event in data:
-        category_counts[event['cim_category']] += 1
+    category_counts = data.group_by('cim_category', maintain_order=True).len()
     
     # Create bar plot
     plt.figure(figsize=(12, 6))
-    categories = list(category_counts.keys())
-    counts = list(category_counts.values())
+    categories = category_counts['cim_category'].to_list()
+    counts = category_counts['len'].to_list()
     
     bars = plt.bar(categories, counts)
     plt.title('Distribution of Events by CIM Category')
@@ -39,15 +45,16 @@ def create_event_distribution_plot(data):
 
 def create_action_distribution_plot(data):
     # Count actions by category
-    action_by_category = defaultdict(lambda: defaultdict(int))
-    for event in data:
-        category = event['cim_category']
-        action = event['data']['action']
-        action_by_category[category][action] += 1
+    action_by_category = count_by_category(data, 'action')
+    actions = action_by_category['action'].to_list()
     
     # Create stacked bar plot
-    df = pd.DataFrame(action_by_category).fillna(0)
-    ax = df.plot(kind='bar', stacked=True, figsize=(12, 6))
+    plt.figure(figsize=(12, 6))
+    bottom = np.zeros(len(actions))
+    for category in action_by_category.columns[1:]:
+        counts = action_by_category[category].to_numpy()
+        plt.bar(actions, counts, bottom=bottom, label=category)
+        bottom += counts
     plt.title('Distribution of Actions by CIM Category')
     plt.xlabel('Action Type')
     plt.ylabel('Number of Events')
@@ -57,23 +64,17 @@ def create_action_distribution_plot(data):
     plt.close()
 
 def create_temporal_distribution_plot(data):
-    # Convert timestamps to datetime and count events by hour
-    timestamps = []
-    categories = []
-    for event in data:
-        timestamp = datetime.strptime(event['data']['timestamp'], '%Y-%m-%dT%H:%M:%S.%f')
-        timestamps.append(timestamp)
-        categories.append(event['cim_category'])
-    
-    df = pd.DataFrame({'timestamp': timestamps, 'category': categories})
-    df['hour'] = df['timestamp'].dt.hour
+    # Count events by category and hour of day
+    hourly_counts = (
+        data.drop_nulls('timestamp')
+        .group_by('cim_category', pl.col('timestamp').dt.hour().alias('hour'), maintain_order=True).len()
+    )
     
-    # Create line plot
+    # Create line plot, one line per category in order of first appearance
     plt.figure(figsize=(12, 6))
-    for category in df['category'].unique():
-        category_data = df[df['category'] == category]
-        hourly_counts = category_data.groupby('hour').size()
-        plt.plot(hourly_counts.index, hourly_counts.values, label=category, marker='o')
+    for (category,), counts in hourly_counts.group_by('cim_category', maintain_order=True):
+        counts = counts.sort('hour')
+        plt.plot(counts['hour'], counts['len'], label=category, marker='o')
     
     plt.title('Temporal Distribution of Events by CIM Category')
     plt.xlabel('Hour of Day')
@@ -86,16 +87,12 @@ def create_temporal_distribution_plot(data):
 
 def create_app_distribution_plot(data):
     # Count applications by category
-    app_by_category = defaultdict(lambda: defaultdict(int))
-    for event in data:
-        category = event['cim_category']
-        app = event['data']['app']
-        app_by_category[category][app] += 1
+    app_by_category = count_by_category(data, 'app')
     
     # Create heatmap
-    df = pd.DataFrame(app_by_category).fillna(0)
     plt.figure(figsize=(12, 8))
-    sns.heatmap(df, annot=True, fmt='g', cmap='YlOrRd')
+    sns.heatmap(app_by_category.drop('app').to_numpy(), annot=True, fmt='g', cmap='YlOrRd',
+                xticklabels=app_by_category.columns[1:], yticklabels=app_by_category['app'].to_list())
     plt.title('Application Usage by CIM Category')
     plt.xlabel('CIM Category')
     plt.ylabel('Application')